@@ -17,35 +17,126 @@ E_bty  = sum_j (beta_j * P_j)
 E_bon  = O * sum_k (q_k * v_k)
 E      = E_prod + E_bty + E_bon
 """
-import json, argparse, sys
-from dataclasses import dataclass
-from typing import List, Dict, Any
+import json, argparse, os, sys
+from functools import lru_cache
+from typing import Iterable, List, Dict, Any, NamedTuple, Optional, Sequence, Tuple, Union
 
-@dataclass
-class Module:
+class Module(NamedTuple):
     name: str
     weight: float
     conv: float
     aov: float
     rate: float
 
-@dataclass
-class Bounty:
+class Bounty(NamedTuple):
     name: str
     attach: float
     payout: float
 
-@dataclass
-class Bonus:
+class Bonus(NamedTuple):
     name: str
     order_share: float
     payout: float
 
-def _nonneg(name: str, *vals: float):
-    if any(v < 0 for v in vals):
-        raise ValueError(f"Negative value in {name}: {vals}")
+class EPCResult(NamedTuple):
+    """Flat result record: one allocation per call instead of four nested dicts."""
+    orders_per_click: float
+    epc_products: float
+    epc_bounties: float
+    epc_bonuses: float
+    epc: float
+    revenue_per_1000_clicks: float
+    orders_per_1000_clicks: float
+    breakeven_cpc: float
+    cpc_cap_for_margin: float
+    target_margin: float
+    inputs: Optional[Dict[str, Any]] = None
 
-def compute(model: Dict[str, Any], margin: float = 0.30, strict: bool = False) -> Dict[str, Any]:
+    def to_dict(self) -> Dict[str, Any]:
+        """Nested inputs/components/totals/pricing layout used by the JSON output."""
+        res = {"inputs": self.inputs} if self.inputs is not None else {}
+        res["components"] = {
+            "orders_per_click": self.orders_per_click,
+            "epc_products": self.epc_products,
+            "epc_bounties": self.epc_bounties,
+            "epc_bonuses": self.epc_bonuses
+        }
+        res["totals"] = {
+            "epc": self.epc,
+            "revenue_per_1000_clicks": self.revenue_per_1000_clicks,
+            "orders_per_1000_clicks": self.orders_per_1000_clicks
+        }
+        res["pricing"] = {
+            "breakeven_cpc": self.breakeven_cpc,
+            "cpc_cap_for_margin": self.cpc_cap_for_margin,
+            "target_margin": self.target_margin
+        }
+        return res
+
+def _check_nonneg(kind: str, items: Sequence[Union[Module, Bounty, Bonus]],
+                  *cols: Sequence[float]):
+    # One C-level min() per column; only walk the records to name the culprit on failure.
+    # Each column is tested on its own: a NaN min() is never >= 0, so it falls through to the
+    # walk instead of being dropped by an outer min() and hiding a negative.
+    if not items or all(min(col) >= 0 for col in cols):
+        return
+    for it in items:
+        vals = it[1:]
+        if any(v < 0 for v in vals):
+            raise ValueError(f"Negative value in {kind} '{it.name}': {vals}")
+
+# Every reduction accumulates plainly left to right. sum() is compensated on 3.12+, so mixing
+# it in would make the unrolled, loop and batched paths (and the weight check) disagree.
+def _total(xs) -> float:
+    t = 0.0
+    for x in xs:
+        t += x
+    return t
+
+def _dot(xs, ys) -> float:
+    t = 0.0
+    for x, y in zip(xs, ys):
+        t += x * y
+    return t
+
+def _kernel(w, c, a, r, beta, P) -> Tuple[float, float, float]:
+    """Pure arithmetic on packed columns; returns (O, E_prod, E_bty)."""
+    # One fused pass: w*c is formed once and feeds both O and E_prod.
+    O = 0.0
+    E_prod = 0.0
+    for wi, ci, ai, ri in zip(w, c, a, r):
+        wc = wi * ci
+        O += wc
+        E_prod += wc * ai * ri
+    return O, E_prod, _dot(beta, P)
+
+# Shapes up to this size get a generated straight-line kernel; larger ones use the loop.
+_UNROLL_MAX = 32
+
+@lru_cache(maxsize=64)
+def _specialize(n: int, j: int):
+    """Generate and compile a _kernel equivalent fully unrolled for n modules and j bounties.
+
+    Terms are accumulated left to right from 0.0, the same order as _kernel and _dot, so
+    results are bit-identical to the loop path.
+    """
+    name = f"_kernel_{n}x{j}"
+    lines = [f"def {name}(w, c, a, r, beta, P):"]
+    for col, var, size in (("w", "w", n), ("c", "c", n), ("a", "a", n), ("r", "r", n),
+                           ("beta", "b", j), ("P", "p", j)):
+        if size:
+            lines.append(f"    {', '.join(f'{var}{i}' for i in range(size))}, = {col}")
+    lines += [f"    wc{i} = w{i} * c{i}" for i in range(n)]
+    O = "0.0" + "".join(f" + wc{i}" for i in range(n))
+    E_prod = "0.0" + "".join(f" + wc{i} * a{i} * r{i}" for i in range(n))
+    E_bty = "0.0" + "".join(f" + b{i} * p{i}" for i in range(j))
+    lines.append(f"    return {O}, {E_prod}, {E_bty}")
+    namespace: Dict[str, Any] = {}
+    exec(compile("\n".join(lines) + "\n", f"<epc {name}>", "exec"), namespace)
+    return namespace[name]
+
+def _reduce(model: Dict[str, Any], strict: bool) -> Tuple[float, float, float, float, float]:
+    """Validate and reduce one model; returns (O, E_prod, E_bty, E_bon, E)."""
     modules = [Module(**m) for m in model.get("modules", [])]
     bounties = [Bounty(**b) for b in model.get("bounties", [])]
     bonuses = [Bonus(**k) for k in model.get("bonuses", [])]
@@ -53,41 +144,144 @@ def compute(model: Dict[str, Any], margin: float = 0.30, strict: bool = False) -
     if strict and not modules:
         raise ValueError("strict mode: at least one module required")
 
-    total_weight = sum(m.weight for m in modules)
+    # Pack fields into columns once (struct-of-arrays) so the reductions below
+    # are straight dot products instead of repeated attribute lookups.
+    w = [m.weight for m in modules]
+    c = [m.conv for m in modules]
+    a = [m.aov for m in modules]
+    r = [m.rate for m in modules]
+    beta = [b.attach for b in bounties]
+    P = [b.payout for b in bounties]
+    q = [k.order_share for k in bonuses]
+    v = [k.payout for k in bonuses]
+
+    total_weight = _total(w)
     if modules and not (abs(total_weight - 1.0) < 1e-6):
         raise ValueError(f"Module weights must sum to 1.0 (got {total_weight:.6f}).")
-    for m in modules:
-        _nonneg(f"module '{m.name}'", m.weight, m.conv, m.aov, m.rate)
-    for b in bounties:
-        _nonneg(f"bounty '{b.name}'", b.attach, b.payout)
-    for k in bonuses:
-        _nonneg(f"bonus '{k.name}'", k.order_share, k.payout)
-
-    O = sum(m.weight * m.conv for m in modules) if modules else 0.0
-    E_prod = sum(m.weight * m.conv * m.aov * m.rate for m in modules) if modules else 0.0
-    E_bty  = sum(b.attach * b.payout for b in bounties) if bounties else 0.0
-    E_bon  = O * sum(k.order_share * k.payout for k in bonuses) if bonuses else 0.0
+    _check_nonneg("module", modules, w, c, a, r)
+    _check_nonneg("bounty", bounties, beta, P)
+    _check_nonneg("bonus", bonuses, q, v)
+
+    n, j = len(w), len(beta)
+    kernel = _specialize(n, j) if n <= _UNROLL_MAX and j <= _UNROLL_MAX else _kernel
+    O, E_prod, E_bty = kernel(w, c, a, r, beta, P)
+    E_bon  = O * _dot(q, v)
     E = E_prod + E_bty + E_bon
+    return O, E_prod, E_bty, E_bon, E
 
-    return {
-        "inputs": model,
-        "components": {
-            "orders_per_click": O,
-            "epc_products": E_prod,
-            "epc_bounties": E_bty,
-            "epc_bonuses": E_bon
-        },
-        "totals": {
-            "epc": E,
-            "revenue_per_1000_clicks": E * 1000.0,
-            "orders_per_1000_clicks": O * 1000.0
-        },
-        "pricing": {
-            "breakeven_cpc": E,
-            "cpc_cap_for_margin": E * (1.0 - margin),
-            "target_margin": margin
-        }
-    }
+def _result(model: Dict[str, Any], terms: Tuple[float, float, float, float, float],
+            margin: float, include_inputs: bool = True) -> EPCResult:
+    O, E_prod, E_bty, E_bon, E = terms
+    return EPCResult(
+        orders_per_click=O,
+        epc_products=E_prod,
+        epc_bounties=E_bty,
+        epc_bonuses=E_bon,
+        epc=E,
+        revenue_per_1000_clicks=E * 1000.0,
+        orders_per_1000_clicks=O * 1000.0,
+        breakeven_cpc=E,
+        cpc_cap_for_margin=E * (1.0 - margin),
+        target_margin=margin,
+        inputs=model if include_inputs else None
+    )
+
+def compute(model: Dict[str, Any], margin: float = 0.30, strict: bool = False,
+            include_inputs: bool = True) -> EPCResult:
+    return _result(model, _reduce(model, strict), margin, include_inputs)
+
+def compute_batch(models: Iterable[Dict[str, Any]], margin: float = 0.30,
+                  strict: bool = False, include_inputs: bool = True) -> List[EPCResult]:
+    """Evaluate many scenarios with one packing pass and one reduction loop per term.
+
+    Results match [compute(m, ...) for m in models]. Validation runs once over the packed
+    columns; if it fails, the per-model path re-runs so the error is the one compute() raises.
+    """
+    models = list(models)  # walked more than once; don't let a generator run dry
+
+    def scalar() -> List[EPCResult]:
+        return [_result(m, _reduce(m, strict), margin, include_inputs) for m in models]
+
+    # Rows of every scenario in shared lists; *_seg maps each row back to its scenario.
+    mods: List[Module] = []
+    btys: List[Bounty] = []
+    bons: List[Bonus] = []
+    mod_seg: List[int] = []
+    bty_seg: List[int] = []
+    bon_seg: List[int] = []
+    try:
+        for s, model in enumerate(models):
+            rows = [Module(**m) for m in model.get("modules", [])]
+            if strict and not rows:
+                return scalar()
+            mods += rows
+            mod_seg += [s] * len(rows)
+            rows = [Bounty(**b) for b in model.get("bounties", [])]
+            btys += rows
+            bty_seg += [s] * len(rows)
+            rows = [Bonus(**k) for k in model.get("bonuses", [])]
+            bons += rows
+            bon_seg += [s] * len(rows)
+    except TypeError:
+        return scalar()
+
+    _, w, c, a, r = zip(*mods) if mods else ((),) * 5
+    _, beta, P = zip(*btys) if btys else ((),) * 3
+    _, q, v = zip(*bons) if bons else ((),) * 3
+    # not (>= 0) so a column whose min() is NaN also takes the exact per-model path.
+    if any(col and not (min(col) >= 0) for col in (w, c, a, r, beta, P, q, v)):
+        return scalar()
+
+    M = len(models)
+    W = [0.0] * M
+    O = [0.0] * M
+    E_prod = [0.0] * M
+    E_bty = [0.0] * M
+    sum_qv = [0.0] * M
+    for s, wi, ci, ai, ri in zip(mod_seg, w, c, a, r):
+        wc = wi * ci
+        W[s] += wi
+        O[s] += wc
+        E_prod[s] += wc * ai * ri
+    for s, bi, pi in zip(bty_seg, beta, P):
+        E_bty[s] += bi * pi
+    for s, qi, vi in zip(bon_seg, q, v):
+        sum_qv[s] += qi * vi
+
+    has_modules = set(mod_seg)
+    if any(not (abs(W[s] - 1.0) < 1e-6) for s in has_modules):
+        return scalar()
+
+    out = []
+    for s, model in enumerate(models):
+        E_bon = O[s] * sum_qv[s]
+        E = E_prod[s] + E_bty[s] + E_bon
+        out.append(_result(model, (O[s], E_prod[s], E_bty[s], E_bon, E), margin, include_inputs))
+    return out
+
+@lru_cache(maxsize=64)
+def _load_model(path: str, mtime: float) -> Dict[str, Any]:
+    """Decode a model file; mtime is part of the cache key so edits invalidate it.
+
+    The returned dict is shared between cache hits and must not be mutated.
+    """
+    with open(path, "rb") as f:
+        return json.loads(f.read())
+
+# Whole summary as one template: a single format() and write() instead of a print() per line.
+_SUMMARY = (
+    "== EPC CALC RESULT ==\n"
+    "EPC (USD/click):         {epc:.6f}\n"
+    "Revenue per 1000 clicks: ${revenue_per_1000_clicks:.2f}\n"
+    "Orders per 1000 clicks:   {orders_per_1000_clicks:.2f}\n"
+    "--- Components ---\n"
+    "EPC - Products:          {epc_products:.6f}\n"
+    "EPC - Bounties:          {epc_bounties:.6f}\n"
+    "EPC - Bonuses:           {epc_bonuses:.6f}\n"
+    "--- Pricing Guidance ---\n"
+    "Break-even CPC:          ${breakeven_cpc:.4f}\n"
+    "CPC cap @ margin {target_margin:.0%}: ${cpc_cap_for_margin:.4f}\n"
+)
 
 def main():
     ap = argparse.ArgumentParser()
@@ -95,27 +289,19 @@ def main():
     ap.add_argument("--margin", type=float, default=0.30, help="Target margin for CPC cap (default 0.30)")
     ap.add_argument("--out", dest="out_path", default="epc_result.json", help="Where to write result JSON")
     ap.add_argument("--strict", action="store_true", help="Stricter validations (requires modules, weights sum==1)")
+    ap.add_argument("--echo-inputs", action="store_true", help="Copy the input model into the result JSON")
     args = ap.parse_args()
 
-    with open(args.in_path, "r") as f:
-        model = json.load(f)
+    model = _load_model(args.in_path, os.path.getmtime(args.in_path))
 
-    res = compute(model, margin=args.margin, strict=bool(args.strict))
+    res = compute(model, margin=args.margin, strict=bool(args.strict),
+                  include_inputs=bool(args.echo_inputs))
+    # Encode in one go and write once; json.dump would issue a write per chunk.
+    out = json.dumps(res.to_dict(), indent=2)
     with open(args.out_path, "w") as f:
-        json.dump(res, f, indent=2)
-
-    t, c, p = res["totals"], res["components"], res["pricing"]
-    print("== EPC CALC RESULT ==")
-    print(f"EPC (USD/click):         {t['epc']:.6f}")
-    print(f"Revenue per 1000 clicks: ${t['revenue_per_1000_clicks']:.2f}")
-    print(f"Orders per 1000 clicks:   {t['orders_per_1000_clicks']:.2f}")
-    print("--- Components ---")
-    print(f"EPC - Products:          {c['epc_products']:.6f}")
-    print(f"EPC - Bounties:          {c['epc_bounties']:.6f}")
-    print(f"EPC - Bonuses:           {c['epc_bonuses']:.6f}")
-    print("--- Pricing Guidance ---")
-    print(f"Break-even CPC:          ${p['breakeven_cpc']:.4f}")
-    print(f"CPC cap @ margin {p['target_margin']:.0%}: ${p['cpc_cap_for_margin']:.4f}")
+        f.write(out)
+
+    sys.stdout.write(_SUMMARY.format(**res._asdict()))
 
 if __name__ == "__main__":
     try:
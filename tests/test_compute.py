@@ -1,23 +1,124 @@
-import unittest, json
+import unittest, json, os, tempfile
 import epc_model as epc
 
+MODEL = {
+    "modules": [
+        {"name":"A","weight":0.60,"conv":0.030,"aov":45.0,"rate":0.030},
+        {"name":"B","weight":0.25,"conv":0.030,"aov":90.0,"rate":0.045},
+        {"name":"C","weight":0.15,"conv":0.025,"aov":150.0,"rate":0.040}
+    ],
+    "bounties":[{"name":"B1","attach":0.008,"payout":3.0},
+                {"name":"B2","attach":0.002,"payout":10.0}],
+    "bonuses":[{"name":"Q1","order_share":0.10,"payout":3.0}]
+}
+
 class TestEPC(unittest.TestCase):
     def test_example_numbers(self):
-        model = {
-            "modules": [
-                {"name":"A","weight":0.60,"conv":0.030,"aov":45.0,"rate":0.030},
-                {"name":"B","weight":0.25,"conv":0.030,"aov":90.0,"rate":0.045},
-                {"name":"C","weight":0.15,"conv":0.025,"aov":150.0,"rate":0.040}
-            ],
-            "bounties":[{"name":"B1","attach":0.008,"payout":3.0},
-                        {"name":"B2","attach":0.002,"payout":10.0}],
-            "bonuses":[{"name":"Q1","order_share":0.10,"payout":3.0}]
-        }
-        res = epc.compute(model, margin=0.30, strict=True)
-        self.assertAlmostEqual(res["totals"]["epc"], 0.12995, places=5)
-        self.assertAlmostEqual(res["components"]["epc_products"], 0.077175, places=6)
-        self.assertAlmostEqual(res["components"]["epc_bounties"], 0.044000, places=6)
-        self.assertAlmostEqual(res["components"]["epc_bonuses"], 0.008775, places=6)
+        res = epc.compute(MODEL, margin=0.30, strict=True)
+        self.assertAlmostEqual(res.epc, 0.12995, places=5)
+        self.assertAlmostEqual(res.epc_products, 0.077175, places=6)
+        self.assertAlmostEqual(res.epc_bounties, 0.044000, places=6)
+        self.assertAlmostEqual(res.epc_bonuses, 0.008775, places=6)
+
+    def test_results_are_independent(self):
+        model = json.loads(json.dumps(MODEL))
+        a = epc.compute(MODEL, margin=0.30)
+        b = epc.compute(model, margin=0.50)
+        a.to_dict()["totals"]["epc"] = -1.0
+        self.assertAlmostEqual(a.to_dict()["totals"]["epc"], 0.12995, places=5)
+        self.assertAlmostEqual(a.cpc_cap_for_margin, 0.12995 * 0.7, places=6)
+        self.assertAlmostEqual(b.cpc_cap_for_margin, 0.12995 * 0.5, places=6)
+        self.assertIs(a.inputs, MODEL)
+        self.assertIs(b.inputs, model)
+
+    def test_load_model_refreshes_on_mtime(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "model.json")
+            with open(path, "w") as f:
+                json.dump(MODEL, f)
+            first = epc._load_model(path, os.path.getmtime(path))
+            self.assertIs(epc._load_model(path, os.path.getmtime(path)), first)
+            with open(path, "w") as f:
+                json.dump({"modules": []}, f)
+            os.utime(path, (0, os.path.getmtime(path) + 1))
+            self.assertEqual(epc._load_model(path, os.path.getmtime(path)), {"modules": []})
+
+    def test_batch_matches_single(self):
+        alt = json.loads(json.dumps(MODEL))
+        alt["bonuses"] = []
+        batch = epc.compute_batch([MODEL, alt, MODEL], margin=0.30)
+        self.assertEqual(len(batch), 3)
+        for model, res in zip([MODEL, alt, MODEL], batch):
+            self.assertEqual(res, epc.compute(model, margin=0.30))
+        self.assertAlmostEqual(batch[1].epc_bonuses, 0.0)
+
+    def test_batch_raises_same_error_as_compute(self):
+        bad = json.loads(json.dumps(MODEL))
+        bad["modules"][2]["aov"] = -5.0
+        with self.assertRaisesRegex(ValueError, "module 'C'"):
+            epc.compute_batch([MODEL, bad, MODEL])
+        skewed = json.loads(json.dumps(MODEL))
+        skewed["modules"][0]["weight"] = 0.5
+        with self.assertRaisesRegex(ValueError, "must sum to 1.0"):
+            epc.compute_batch([MODEL, skewed])
+
+    def test_batch_rejects_negative_after_nan(self):
+        bad = json.loads(json.dumps(MODEL))
+        bad["modules"][0]["conv"] = float("nan")
+        bad["modules"][1]["conv"] = -0.1
+        with self.assertRaisesRegex(ValueError, "module 'B'"):
+            epc.compute_batch([bad, MODEL])
+
+    def test_batch_weight_check_matches_compute(self):
+        # Plain left-to-right summation lands just outside the tolerance here; a compensated
+        # sum() would land just inside, so both paths must use the same summation.
+        model = json.loads(json.dumps(MODEL))
+        model["modules"] = [{"name": f"M{i}", "weight": 0.1, "conv": 0.03, "aov": 50.0, "rate": 0.04}
+                            for i in range(10)]
+        model["modules"][-1]["weight"] = 0.099999
+        with self.assertRaisesRegex(ValueError, "must sum to 1.0"):
+            epc.compute(model)
+        with self.assertRaisesRegex(ValueError, "must sum to 1.0"):
+            epc.compute_batch([model])
+
+    def test_batch_accepts_generator(self):
+        batch = epc.compute_batch(m for m in [MODEL, MODEL])
+        self.assertEqual(len(batch), 2)
+        self.assertAlmostEqual(batch[1].epc, 0.12995, places=5)
+
+    def test_negative_value_names_offender(self):
+        model = json.loads(json.dumps(MODEL))
+        model["bounties"][1]["payout"] = -1.0
+        with self.assertRaisesRegex(ValueError, "bounty 'B2'"):
+            epc.compute(model)
+
+    def test_to_dict_nested_layout(self):
+        d = epc.compute(MODEL, margin=0.30).to_dict()
+        self.assertEqual(list(d), ["inputs", "components", "totals", "pricing"])
+        self.assertAlmostEqual(d["totals"]["epc"], 0.12995, places=5)
+        self.assertAlmostEqual(d["pricing"]["cpc_cap_for_margin"], 0.12995 * 0.7, places=6)
+
+    def test_negative_after_nan_is_rejected(self):
+        model = json.loads(json.dumps(MODEL))
+        model["modules"][0]["conv"] = float("nan")
+        model["modules"][1]["conv"] = -0.1
+        with self.assertRaisesRegex(ValueError, "module 'B'"):
+            epc.compute(model)
+
+    def test_include_inputs_false_omits_echo(self):
+        res = epc.compute(MODEL, include_inputs=False)
+        self.assertIsNone(res.inputs)
+        self.assertNotIn("inputs", res.to_dict())
+        self.assertAlmostEqual(res.epc, 0.12995, places=5)
+
+    def test_specialized_kernel_matches_loop(self):
+        # Ten 0.1 bounties round differently under compensated summation; both paths must agree.
+        cols = [[0.5, 0.3, 0.2], [0.03, 0.02, 0.05], [45.0, 90.0, 150.0], [0.03, 0.045, 0.04],
+                [0.1] * 10, [1.0] * 10]
+        fast = epc._specialize(3, 10)(*cols)
+        loop = epc._kernel(*cols)
+        self.assertEqual(fast, loop)
+        self.assertEqual(epc._specialize(0, 0)([], [], [], [], [], []), (0.0, 0.0, 0.0))
 
 if __name__ == "__main__":
     unittest.main()